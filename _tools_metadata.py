@@ -0,0 +1,55 @@
+# Hyper-explicit tool metadata for MCP exposure. Each tool lists its exact parameter names and formats.
+TOOLS_METADATA = {
+    'simulate_stk_push': {
+        'description': (
+            'simulate_stk_push(phone_number, amount, description): Trigger an STK Push via Daraja Sandbox. '
+            'phone_number must be E.164 (e.g., 2547XXXXXXXX). amount must be integer KES. description is a short string.'
+        ),
+        'args': {
+            'phone_number': 'string, E.164 format (e.g., 2547XXXXXXXX)',
+            'amount': 'integer, KES',
+            'description': 'string, short transaction description',
+        }
+    },
+    'query_transaction_status': {
+        'description': (
+            'query_transaction_status(checkout_request_id): Query the status of an STK push using CheckoutRequestID.'
+        ),
+        'args': {
+            'checkout_request_id': 'string, CheckoutRequestID returned by simulate_stk_push'
+        }
+    },
+    'generate_test_credentials': {
+        'description': 'generate_test_credentials(): Return sandbox Shortcode and example Passkey for quick testing.',
+        'args': {}
+    },
+    'register_callback_url': {
+        'description': (
+            'register_callback_url(url): Register a single HTTPS `url` for both ConfirmationURL and ValidationURL '
+            'for C2B/LNMO in the Daraja sandbox. url must be publicly reachable.'
+        ),
+        'args': {
+            'url': 'string, HTTPS public URL to receive Daraja callbacks'
+        }
+    }
+    ,
+    'doc_search': {
+        'description': 'doc_search(query): Find the paragraph in the official Daraja docs that best answers `query`.',
+        'args': {
+            'query': 'string, the developer question or phrase to search for',
+            'top_n': 'integer, optional, number of top paragraph matches to return (default 1)'
+        }
+    }
+    ,
+    'start_ngrok_and_register': {
+        'description': (
+            'start_ngrok_and_register(port=8000, callback_path="/mpesa/callback", ngrok_auth_token=None): '
+            'Start an ngrok tunnel to the local `port` and register the public HTTPS callback URL with Daraja.'
+        ),
+        'args': {
+            'port': 'integer, local port to expose (default 8000)',
+            'callback_path': 'string, path appended to public URL when registering (default /mpesa/callback)',
+            'ngrok_auth_token': 'string, optional ngrok auth token (or set NGROK_AUTH_TOKEN env var)'
+        }
+    }
+}
@@ -1,24 +1,97 @@
 import os
 import time
-import base64
+import tempfile
 import logging
-from datetime import datetime
+import logging.handlers
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any
 
+import numpy as np
+import pybase64
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from _tools_metadata import TOOLS_METADATA  # noqa: F401  (re-exported for existing imports)
 import re
 import difflib
 from typing import List
 
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # optional: fall back to the regex stripper below
+    HTMLParser = None
+
+try:
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+except ImportError:  # optional: fall back to difflib in the fuzzy scorer
+    rf_fuzz = rf_process = None
+
 load_dotenv()
 
+LOG_LEVEL = os.getenv('DARAJA_LOG_LEVEL', 'DEBUG').upper()
+# getLevelName maps a known level name to its int; anything else comes back as a string
+_invalid_log_level = None
+if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+    _invalid_log_level, LOG_LEVEL = LOG_LEVEL, 'DEBUG'
+
 logger = logging.getLogger('daraja_client')
-logger.setLevel(logging.DEBUG)
-fh = logging.FileHandler('m_pesa_debug.log', encoding='utf-8')
-formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-fh.setFormatter(formatter)
-logger.addHandler(fh)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+_LOG_FILE_HANDLER_NAME = 'daraja_log_file'
+# delay=True opens the log file on the first record; rotation bounds its size.
+# server.py attaches this same handler (via get_log_file_handler) so the file has a single writer.
+# Looking it up by name keeps a re-import from attaching a second one.
+_file_handler = next((h for h in logger.handlers if h.get_name() == _LOG_FILE_HANDLER_NAME), None)
+if _file_handler is None:
+    _file_handler = logging.handlers.RotatingFileHandler('m_pesa_debug.log', maxBytes=5_000_000, backupCount=3, encoding='utf-8', delay=True)
+    _file_handler.set_name(_LOG_FILE_HANDLER_NAME)
+    _file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    logger.addHandler(_file_handler)
+
+
+def get_log_file_handler() -> logging.Handler:
+    """Return the rotating handler that writes m_pesa_debug.log."""
+    return _file_handler
+
+
+if _invalid_log_level is not None:
+    logger.warning('Unknown DARAJA_LOG_LEVEL %r; using DEBUG', _invalid_log_level)
+
+# Regex fallback for HTML -> paragraphs, compiled once at import
+_SCRIPT_RE = re.compile(r'(?is)<script.*?>.*?</script>')
+_STYLE_RE = re.compile(r'(?is)<style.*?>.*?</style>')
+_BLOCK_TAG_RE = re.compile(r'(?i)</?(p|div|h[1-6]|li|br|section|article)[^>]*>')
+_TAG_RE = re.compile(r'<[^>]+>')
+_BLANK_LINES_RE = re.compile(r'\n{2,}')
+# Elements treated as paragraphs when a real HTML parser is available
+_PARAGRAPH_TAGS = ('p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+_PARAGRAPH_SELECTOR = ', '.join(_PARAGRAPH_TAGS)
+# Word tokens used by both the TF-IDF vectorizer and the fuzzy fallback scorer
+_WORD_RE = re.compile(r"\w+")
+# ASCII case-fold table for the byte strings compared by the fuzzy fallback scorer
+_LOWER_TABLE = bytes.maketrans(bytes(range(65, 91)), bytes(range(97, 123)))
+
+
+def _fold(text: str) -> bytes:
+    # bytes.translate is an exact lowercase only for pure-ASCII text; anything else goes through str.lower()
+    if text.isascii():
+        return text.encode('ascii').translate(_LOWER_TABLE)
+    return text.lower().encode('utf-8')
+
+
+# On-disk docs index shared across server processes; bump the version when its layout changes
+DOCS_CACHE_VERSION = 3
+DOCS_CACHE_TTL = 24 * 3600
+# Upper bound on concurrent page fetches while building the docs index
+DOCS_FETCH_WORKERS = 8
+
+# Seconds before expiry at which a cached OAuth token is no longer handed out
+TOKEN_REFRESH_MARGIN = 60
+# Seconds before expiry at which a background timer fetches the next token
+TOKEN_PREFRESH_LEAD = 120
 
 
 class DarajaClient:
@@ -31,6 +104,10 @@ class DarajaClient:
     - DARAJA_PASSKEY (sandbox example provided)
     - DARAJA_CALLBACK_URL (optional)
     - DARAJA_BASE_URL (optional, defaults to sandbox)
+    - DARAJA_DOCS_URL (optional, comma-separated docs pages to index, defaults to the developer portal)
+    - DARAJA_DOCS_CACHE (optional, docs index file, defaults to daraja_docs.idx)
+    - DARAJA_DOCS_REFRESH (optional, set to 1 to ignore the cached docs index and refetch)
+    - DARAJA_LOG_LEVEL (optional, defaults to DEBUG)
     """
 
     def __init__(
@@ -46,40 +123,137 @@ class DarajaClient:
         # Example sandbox passkey used in Safaricom docs — replace with your account's passkey in production
         self.passkey = passkey or os.getenv('DARAJA_PASSKEY', 'bfb279f9aa9bdbcf1xxxxxxxxxxxxxxxxxxxxxxxxxxxx')
         self.base_url = os.getenv('DARAJA_BASE_URL', 'https://sandbox.safaricom.co.ke')
+        self._callback_url = os.getenv('DARAJA_CALLBACK_URL', 'https://example.com/mpesa/callback')
+        # endpoint urls resolved once from base_url rather than formatted per request
+        self._oauth_url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
+        self._stk_push_url = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
+        self._stk_query_url = f"{self.base_url}/mpesa/stkpushquery/v1/query"
+        self._c2b_register_url = f"{self.base_url}/mpesa/c2b/v1/registerurl"
+        # shortcode+passkey never change for a client, so only the timestamp is appended per call
+        self._shortcode_passkey_prefix = f"{self.shortcode}{self.passkey}".encode('utf-8')
+        # (timestamp, password) of the last generated password; calls within the same second reuse it.
+        # Kept as one tuple so concurrent readers never see a timestamp paired with another second's password.
+        self._pw_cache: tuple = ('', '')
+        # (epoch second, formatted timestamp) so strftime runs at most once per second
+        self._ts_cache: tuple = (0, '')
 
         self._token: Optional[str] = None
         self._token_expires_at: float = 0
-        # documentation index cache: list of (paragraph, source_url)
-        self._docs_index: List[tuple] = []
-        self._docs_sources: List[str] = [os.getenv('DARAJA_DOCS_URL', 'https://developer.safaricom.co.ke/')]
+        # tool calls may run concurrently (see server.py); only one thread refreshes the token
+        self._token_lock = threading.Lock()
+        # request headers for the current token, rebuilt only when the token changes
+        self._auth_headers: Dict[str, str] = {}
+        # cancels the pending pre-refresh timer; also runs when the client is garbage collected
+        self._prefresh_cancel: Optional[weakref.finalize] = None
+        # set by tool calls served from the cached token; an idle client stops pre-refreshing
+        self._token_used_since_refresh = False
+
+        # one pooled keep-alive session so bursts of calls reuse the same TLS connection.
+        # Retry only covers idempotent methods by default, so STK pushes are never re-sent.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+        )
+        self._session.mount('https://', adapter)
+        self._session.headers.update({'User-Agent': 'daraja-mcp/1.0'})
+
+        # documentation index cache as parallel lists: paragraph text and its source url
+        self._paras: List[str] = []
+        self._sources: List[str] = []
+        # per-paragraph lowercase utf-8 bytes and token sets for the fuzzy fallback (empty while TF-IDF is in use)
+        self._docs_lower: List[bytes] = []
+        self._docs_tokens: List[frozenset] = []
+        docs_urls = os.getenv('DARAJA_DOCS_URL', 'https://developer.safaricom.co.ke/')
+        self._docs_sources: List[str] = [u.strip() for u in docs_urls.split(',') if u.strip()]
+        self._docs_lock = threading.Lock()
+        # TF-IDF model over the indexed paragraphs (None when scikit-learn is unavailable)
+        self._vectorizer = None
+        self._doc_matrix = None
+        self._docs_cache_path = os.getenv('DARAJA_DOCS_CACHE', 'daraja_docs.idx')
 
     def _get_timestamp(self) -> str:
-        return datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        now = int(time.time())
+        cached_epoch, cached_ts = self._ts_cache
+        if now == cached_epoch:
+            return cached_ts
+        timestamp = time.strftime('%Y%m%d%H%M%S', time.gmtime(now))
+        self._ts_cache = (now, timestamp)
+        return timestamp
 
     def _generate_password(self, timestamp: str) -> str:
-        raw = f"{self.shortcode}{self.passkey}{timestamp}"
-        encoded = base64.b64encode(raw.encode('utf-8')).decode('utf-8')
-        return encoded
+        cached_ts, cached_pw = self._pw_cache
+        if timestamp == cached_ts:
+            return cached_pw
+        password = pybase64.b64encode_as_string(self._shortcode_passkey_prefix + timestamp.encode('utf-8'))
+        self._pw_cache = (timestamp, password)
+        return password
 
     def _get_oauth(self) -> str:
-        if self._token and time.time() < self._token_expires_at - 30:
+        if self._token and time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN:
+            self._token_used_since_refresh = True
             return self._token
 
+        with self._token_lock:
+            # another thread may have refreshed the token while we waited for the lock
+            if self._token and time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN:
+                self._token_used_since_refresh = True
+                return self._token
+            return self._refresh_token()
+
+    def _refresh_token(self) -> str:
+        # caller must hold self._token_lock
         if not (self.consumer_key and self.consumer_secret):
             raise RuntimeError('DARAJA_CONSUMER_KEY and DARAJA_CONSUMER_SECRET must be set in .env or passed in')
 
-        url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
+        url = self._oauth_url
         logger.debug('Requesting OAuth token from %s', url)
-        r = requests.get(url, auth=(self.consumer_key, self.consumer_secret), timeout=10)
+        # expires_in counts from when Daraja issued the token, so anchor it to the request start
+        requested_at = time.time()
+        r = self._session.get(url, auth=(self.consumer_key, self.consumer_secret), timeout=10)
         r.raise_for_status()
         data = r.json()
         token = data.get('access_token')
         expires_in = int(data.get('expires_in', 3600))
+        self._auth_headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
         self._token = token
-        self._token_expires_at = time.time() + expires_in
+        self._token_expires_at = requested_at + expires_in
         logger.debug('Obtained OAuth token, expires in %s seconds', expires_in)
+        self._token_used_since_refresh = False
+        self._schedule_token_prefresh(expires_in)
         return token
 
+    def _schedule_token_prefresh(self, expires_in: int) -> None:
+        # fetch the next token ahead of expiry so tool calls never wait on the OAuth round trip
+        delay = expires_in - TOKEN_PREFRESH_LEAD
+        if delay < TOKEN_PREFRESH_LEAD:
+            # short-lived tokens would refresh in a tight loop; leave them to _get_oauth
+            return
+        if self._prefresh_cancel is not None:
+            self._prefresh_cancel()
+        # the timer only holds a weak reference, so a discarded client is collected and its timer cancelled
+        timer = threading.Timer(delay, DarajaClient._prefresh_token, args=(weakref.ref(self),))
+        timer.daemon = True
+        timer.start()
+        self._prefresh_cancel = weakref.finalize(self, timer.cancel)
+
+    @staticmethod
+    def _prefresh_token(client_ref: 'weakref.ref[DarajaClient]') -> None:
+        self = client_ref()
+        if self is None:
+            return
+        with self._token_lock:
+            if not self._token_used_since_refresh:
+                # nobody used the token since it was fetched; the next call refreshes on demand
+                logger.debug('Skipping background OAuth token refresh for an idle client')
+                return
+            try:
+                self._refresh_token()
+            except Exception:
+                # the current token is still valid; _get_oauth retries once it nears expiry
+                logger.exception('Background OAuth token refresh failed')
+
     def simulate_stk_push(self, phone_number: str, amount: int, description: str = 'Payment') -> Dict[str, Any]:
         """Simulate an STK Push to `phone_number` for `amount` KES with `description`.
 
@@ -89,12 +263,10 @@ class DarajaClient:
 
         Returns the JSON response from Daraja.
         """
-        token = self._get_oauth()
+        self._get_oauth()
         timestamp = self._get_timestamp()
         password = self._generate_password(timestamp)
 
-        callback = os.getenv('DARAJA_CALLBACK_URL', 'https://example.com/mpesa/callback')
-
         payload = {
             'BusinessShortCode': self.shortcode,
             'Password': password,
@@ -104,15 +276,15 @@ class DarajaClient:
             'PartyA': phone_number,
             'PartyB': self.shortcode,
             'PhoneNumber': phone_number,
-            'CallBackURL': callback,
+            'CallBackURL': self._callback_url,
             'AccountReference': description[:12],
             'TransactionDesc': description,
         }
 
-        url = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
-        headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
-        logger.debug('Sending STK push request to %s payload=%s', url, payload)
-        r = requests.post(url, json=payload, headers=headers, timeout=15)
+        url = self._stk_push_url
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Sending STK push request to %s payload=%s', url, payload)
+        r = self._session.post(url, json=payload, headers=self._auth_headers, timeout=15)
         r.raise_for_status()
         return r.json()
 
@@ -121,7 +293,7 @@ class DarajaClient:
 
         - `checkout_request_id`: the CheckoutRequestID returned by `simulate_stk_push`.
         """
-        token = self._get_oauth()
+        self._get_oauth()
         timestamp = self._get_timestamp()
         password = self._generate_password(timestamp)
 
@@ -132,10 +304,9 @@ class DarajaClient:
             'CheckoutRequestID': checkout_request_id,
         }
 
-        url = f"{self.base_url}/mpesa/stkpushquery/v1/query"
-        headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        url = self._stk_query_url
         logger.debug('Querying STK push status for %s', checkout_request_id)
-        r = requests.post(url, json=payload, headers=headers, timeout=15)
+        r = self._session.post(url, json=payload, headers=self._auth_headers, timeout=15)
         r.raise_for_status()
         return r.json()
 
@@ -156,49 +327,182 @@ class DarajaClient:
 
         - `url`: publicly reachable HTTPS URL. The sandbox can use ngrok-forwarded URLs.
         """
-        token = self._get_oauth()
+        self._get_oauth()
         payload = {
             'ShortCode': self.shortcode,
             'ResponseType': 'Completed',
             'ConfirmationURL': url,
             'ValidationURL': url,
         }
-        url_api = f"{self.base_url}/mpesa/c2b/v1/registerurl"
-        headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
         logger.debug('Registering callback URL %s', url)
-        r = requests.post(url_api, json=payload, headers=headers, timeout=10)
+        r = self._session.post(self._c2b_register_url, json=payload, headers=self._auth_headers, timeout=10)
         r.raise_for_status()
         return r.json()
 
     # -- Documentation indexing and search -------------------------------------------------
     def _extract_text_paragraphs(self, html: str) -> List[str]:
+        if HTMLParser is not None:
+            # single DOM walk in C; tolerant of malformed markup
+            tree = HTMLParser(html)
+            paragraphs = []
+            for node in tree.css(_PARAGRAPH_SELECTOR):
+                # only the outermost match is kept: its text already includes any nested
+                # paragraph elements, e.g. <li>Intro<p>First</p></li>
+                if self._has_paragraph_ancestor(node):
+                    continue
+                text = node.text(separator=' ', strip=True)
+                if text:
+                    paragraphs.append(text)
+            return paragraphs
+
         # Very small, robust HTML -> text stripper to get paragraphs
-        text = re.sub(r'(?is)<script.*?>.*?</script>', '', html)
-        text = re.sub(r'(?is)<style.*?>.*?</style>', '', text)
+        text = _SCRIPT_RE.sub('', html)
+        text = _STYLE_RE.sub('', text)
         # Replace common block tags with newlines
-        text = re.sub(r'(?i)</?(p|div|h[1-6]|li|br|section|article)[^>]*>', '\n', text)
+        text = _BLOCK_TAG_RE.sub('\n', text)
         # Remove remaining tags
-        text = re.sub(r'<[^>]+>', '', text)
+        text = _TAG_RE.sub('', text)
         # Collapse whitespace
-        text = re.sub(r'\n{2,}', '\n\n', text)
+        text = _BLANK_LINES_RE.sub('\n\n', text)
         paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
         return paragraphs
 
+    @staticmethod
+    def _has_paragraph_ancestor(node) -> bool:
+        parent = node.parent
+        while parent is not None:
+            if parent.tag in _PARAGRAPH_TAGS:
+                return True
+            parent = parent.parent
+        return False
+
     def _build_docs_index(self) -> None:
-        if self._docs_index:
-            return
-        for src in self._docs_sources:
-            try:
-                logger.debug('Fetching docs from %s', src)
-                r = requests.get(src, timeout=10)
-                r.raise_for_status()
-                paras = self._extract_text_paragraphs(r.text)
-                for p in paras:
+        with self._docs_lock:
+            if self._paras:
+                return
+            if self._load_docs_cache():
+                return
+            # build into local lists so concurrent searches never see a half-built index
+            paras: List[str] = []
+            sources: List[str] = []
+            # fetching is network-bound, so pages download in parallel over the pooled session;
+            # parsing stays serial and in source order
+            workers = min(DOCS_FETCH_WORKERS, len(self._docs_sources))
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                pages = list(pool.map(self._fetch_docs_page, self._docs_sources))
+            complete = True
+            for src, html in zip(self._docs_sources, pages):
+                if html is None:
+                    complete = False
+                    continue
+                try:
                     # keep short paragraphs too
-                    self._docs_index.append((p, src))
-                logger.info('Indexed %d paragraphs from %s', len(paras), src)
-            except Exception as e:
-                logger.exception('Failed to fetch docs from %s: %s', src, e)
+                    src_paras = self._extract_text_paragraphs(html)
+                except Exception as e:
+                    logger.exception('Failed to parse docs from %s: %s', src, e)
+                    complete = False
+                    continue
+                paras.extend(src_paras)
+                sources.extend([src] * len(src_paras))
+                logger.info('Indexed %d paragraphs from %s', len(src_paras), src)
+            if paras:
+                self._fit_docs_vectorizer(paras)
+                # a partial index serves this process only; caching it would hide the missing pages for the whole TTL
+                if complete:
+                    self._save_docs_cache(paras, sources)
+            self._set_docs_index(paras, sources)
+
+    def _fetch_docs_page(self, src: str) -> Optional[str]:
+        try:
+            logger.debug('Fetching docs from %s', src)
+            r = self._session.get(src, timeout=10)
+            r.raise_for_status()
+            return r.text
+        except Exception as e:
+            logger.exception('Failed to fetch docs from %s: %s', src, e)
+            return None
+
+    def _set_docs_index(self, paras: List[str], sources: List[str]) -> None:
+        # the fuzzy fallback's per-paragraph data is only derived when there is no TF-IDF model to use
+        if self._vectorizer is None:
+            self._docs_lower = [_fold(p) for p in paras]
+            self._docs_tokens = [frozenset(_WORD_RE.findall(p.lower())) for p in paras]
+        else:
+            self._docs_lower = []
+            self._docs_tokens = []
+        self._sources = sources
+        # publish the paragraphs last: doc_search treats a non-empty list as a ready index
+        self._paras = paras
+
+    def _load_docs_cache(self) -> bool:
+        """Load a fresh on-disk docs index written by `_save_docs_cache`; return True on success."""
+        if os.getenv('DARAJA_DOCS_REFRESH') == '1':
+            return False
+        try:
+            age = time.time() - os.path.getmtime(self._docs_cache_path)
+        except OSError:
+            return False
+        if age > DOCS_CACHE_TTL:
+            return False
+        try:
+            import joblib
+            # mmap the arrays so the TF-IDF matrix pages in lazily instead of being copied
+            data = joblib.load(self._docs_cache_path, mmap_mode='r')
+        except Exception:
+            logger.exception('Failed to load docs index cache %s; rebuilding', self._docs_cache_path)
+            return False
+        if data.get('version') != DOCS_CACHE_VERSION or data.get('sources') != self._docs_sources:
+            return False
+        self._vectorizer = data['vectorizer']
+        self._doc_matrix = data['matrix']
+        self._set_docs_index(data['paras'], data['sources_per_para'])
+        logger.info('Loaded %d docs paragraphs from %s', len(self._paras), self._docs_cache_path)
+        return True
+
+    def _save_docs_cache(self, paras: List[str], sources: List[str]) -> None:
+        try:
+            import joblib
+        except ImportError:
+            return
+        data = {
+            'version': DOCS_CACHE_VERSION,
+            'sources': self._docs_sources,
+            'paras': paras,
+            'sources_per_para': sources,
+            'matrix': self._doc_matrix,
+            'vectorizer': self._vectorizer,
+        }
+        # write a private temp file in the same directory, then rename it into place atomically,
+        # so concurrent builders never share a file and readers never see a partial one
+        cache_dir = os.path.dirname(os.path.abspath(self._docs_cache_path))
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(self._docs_cache_path) + '.', suffix='.tmp')
+            os.close(fd)
+            joblib.dump(data, tmp_path, compress=0)
+            os.replace(tmp_path, self._docs_cache_path)
+        except Exception:
+            logger.exception('Failed to write docs index cache %s', self._docs_cache_path)
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _fit_docs_vectorizer(self, paragraphs: List[str]) -> None:
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+        except ImportError:
+            logger.warning('scikit-learn is not installed; doc_search falls back to fuzzy matching')
+            return
+        vectorizer = TfidfVectorizer(lowercase=True, token_pattern=_WORD_RE.pattern, ngram_range=(1, 2))
+        try:
+            self._doc_matrix = vectorizer.fit_transform(paragraphs)
+        except ValueError as e:
+            # e.g. empty vocabulary when the fetched pages carry no word tokens
+            logger.warning('Could not build TF-IDF docs index, falling back to fuzzy matching: %s', e)
+            return
+        self._vectorizer = vectorizer
 
     def doc_search(self, query: str, top_n: int = 1) -> Dict[str, Any]:
         """Search indexed Daraja docs for the paragraph best matching `query`.
@@ -209,35 +513,58 @@ class DarajaClient:
             raise ValueError('query must be a non-empty string')
 
         # lazy index build (non-blocking attempts with reasonable timeouts)
-        if not self._docs_index:
+        if not self._paras:
             self._build_docs_index()
 
-        if not self._docs_index:
+        if not self._paras:
             return {'query': query, 'matches': [], 'note': 'No documentation indexed; set DARAJA_DOCS_URL or ensure network access.'}
 
-        # Compute similarity using difflib ratio; also boost exact-token matches
-        candidates = []
-        q = query.lower()
-        for para, src in self._docs_index:
-            p_low = para.lower()
-            ratio = difflib.SequenceMatcher(None, q, p_low).ratio()
-            # token overlap boost
-            q_tokens = set(re.findall(r"\w+", q))
-            p_tokens = set(re.findall(r"\w+", p_low))
-            if q_tokens:
-                overlap = len(q_tokens & p_tokens) / len(q_tokens)
-            else:
-                overlap = 0.0
-            score = 0.6 * ratio + 0.4 * overlap
-            candidates.append((score, para, src))
-
-        candidates.sort(reverse=True, key=lambda t: t[0])
+        if self._vectorizer is not None:
+            # TF-IDF rows are L2-normalised, so one sparse product gives the cosine similarity of every paragraph
+            q_vec = self._vectorizer.transform([query])
+            scores = (self._doc_matrix @ q_vec.T).toarray().ravel()
+        else:
+            scores = self._fuzzy_scores(query)
+
         results = []
-        for score, para, src in candidates[:top_n]:
-            results.append({'paragraph': para, 'source': src, 'score': round(float(score), 4)})
+        k = min(top_n, len(scores))
+        if k > 0:
+            # partial selection of the top k, then sort only those
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            for i in top:
+                # zero similarity (e.g. no query term in the TF-IDF vocabulary) is a miss, not a match
+                if scores[i] <= 0:
+                    break
+                results.append({'paragraph': self._paras[i], 'source': self._sources[i], 'score': round(float(scores[i]), 4)})
 
         return {'query': query, 'matches': results}
 
+    def _fuzzy_scores(self, query: str) -> np.ndarray:
+        # Fallback scorer without scikit-learn: edit-distance ratio boosted by exact-token overlap
+        n = len(self._paras)
+        q_low = _fold(query)
+        if rf_process is not None:
+            # the whole 1xN ratio row is computed natively, across all cores
+            ratios = rf_process.cdist([q_low], self._docs_lower, scorer=rf_fuzz.ratio, dtype=np.float32, workers=-1)[0] / 100.0
+        else:
+            # the query is seq2 so SequenceMatcher indexes it once rather than once per paragraph
+            matcher = difflib.SequenceMatcher(None)
+            matcher.set_seq2(q_low)
+            ratios = np.fromiter(self._seq_ratios(matcher, self._docs_lower), dtype=np.float32, count=n)
+
+        q_tokens = frozenset(_WORD_RE.findall(query.lower()))
+        if not q_tokens:
+            return 0.6 * ratios
+        overlap = np.fromiter((len(q_tokens & p_tokens) for p_tokens in self._docs_tokens), dtype=np.float32, count=n)
+        return 0.6 * ratios + 0.4 * (overlap / len(q_tokens))
+
+    @staticmethod
+    def _seq_ratios(matcher: difflib.SequenceMatcher, docs: List[bytes]):
+        for p_low in docs:
+            matcher.set_seq1(p_low)
+            yield matcher.ratio()
+
     def start_ngrok_and_register(self, port: int = 8000, callback_path: str = '/mpesa/callback', ngrok_auth_token: Optional[str] = None, use_https: bool = True) -> Dict[str, Any]:
         """Start an ngrok HTTPS tunnel to `port` and register `public_url+callback_path` with Daraja.
 
@@ -277,60 +604,3 @@ class DarajaClient:
         logger.debug('Registering callback URL %s with Daraja', callback_url)
         reg_res = self.register_callback_url(callback_url)
         return {'public_url': public_url, 'callback_url': callback_url, 'register_result': reg_res}
-
-
-# Hyper-explicit tool metadata for MCP exposure. Each tool lists its exact parameter names and formats.
-TOOLS_METADATA = {
-    'simulate_stk_push': {
-        'description': (
-            'simulate_stk_push(phone_number, amount, description): Trigger an STK Push via Daraja Sandbox. '
-            'phone_number must be E.164 (e.g., 2547XXXXXXXX). amount must be integer KES. description is a short string.'
-        ),
-        'args': {
-            'phone_number': 'string, E.164 format (e.g., 2547XXXXXXXX)',
-            'amount': 'integer, KES',
-            'description': 'string, short transaction description',
-        }
-    },
-    'query_transaction_status': {
-        'description': (
-            'query_transaction_status(checkout_request_id): Query the status of an STK push using CheckoutRequestID.'
-        ),
-        'args': {
-            'checkout_request_id': 'string, CheckoutRequestID returned by simulate_stk_push'
-        }
-    },
-    'generate_test_credentials': {
-        'description': 'generate_test_credentials(): Return sandbox Shortcode and example Passkey for quick testing.',
-        'args': {}
-    },
-    'register_callback_url': {
-        'description': (
-            'register_callback_url(url): Register a single HTTPS `url` for both ConfirmationURL and ValidationURL '
-            'for C2B/LNMO in the Daraja sandbox. url must be publicly reachable.'
-        ),
-        'args': {
-            'url': 'string, HTTPS public URL to receive Daraja callbacks'
-        }
-    }
-    ,
-    'doc_search': {
-        'description': 'doc_search(query): Find the paragraph in the official Daraja docs that best answers `query`.',
-        'args': {
-            'query': 'string, the developer question or phrase to search for',
-            'top_n': 'integer, optional, number of top paragraph matches to return (default 1)'
-        }
-    }
-    ,
-    'start_ngrok_and_register': {
-        'description': (
-            'start_ngrok_and_register(port=8000, callback_path="/mpesa/callback", ngrok_auth_token=None): '
-            'Start an ngrok tunnel to the local `port` and register the public HTTPS callback URL with Daraja.'
-        ),
-        'args': {
-            'port': 'integer, local port to expose (default 8000)',
-            'callback_path': 'string, path appended to public URL when registering (default /mpesa/callback)',
-            'ngrok_auth_token': 'string, optional ngrok auth token (or set NGROK_AUTH_TOKEN env var)'
-        }
-    }
-}
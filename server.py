@@ -1,32 +1,103 @@
 import sys
-import json
+import asyncio
 import logging
-from daraja_client import DarajaClient, TOOLS_METADATA
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import orjson
+from daraja_client import DarajaClient, LOG_LEVEL, get_log_file_handler
+from _tools_metadata import TOOLS_METADATA
 
 logger = logging.getLogger('daraja_server')
-logger.setLevel(logging.DEBUG)
-fh = logging.FileHandler('m_pesa_debug.log', encoding='utf-8')
-formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-fh.setFormatter(formatter)
-logger.addHandler(fh)
-# Also log to stderr so humans see startup progress (won't interfere with stdout JSON)
-sh = logging.StreamHandler(sys.stderr)
-sh.setFormatter(formatter)
-logger.addHandler(sh)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+if not logger.handlers:
+    # Share the client's rotating file handler: one open file, one rotation owner
+    fh = get_log_file_handler()
+    logger.addHandler(fh)
+    # Also log to stderr so humans see startup progress (won't interfere with stdout JSON)
+    sh = logging.StreamHandler(sys.stderr)
+    sh.setFormatter(fh.formatter)
+    logger.addHandler(sh)
+
+# Tool calls block on Daraja HTTP round trips; running them on a small pool lets
+# concurrent requests overlap their network waits instead of queueing behind each other.
+MAX_WORKERS = 8
 
 
 def send_response(req_id, result=None, error=None):
+    # Only called from the event loop thread, so response lines never interleave.
     resp = {"id": req_id}
     if error:
         resp["error"] = str(error)
     else:
         resp["result"] = result
-    json_str = json.dumps(resp, ensure_ascii=False)
-    sys.stdout.write(json_str + "\n")
-    sys.stdout.flush()
+    # orjson emits newline-terminated UTF-8 bytes, written in one call below the text layer.
+    # Flush per response: MCP clients wait on each line.
+    sys.stdout.buffer.write(orjson.dumps(resp, option=orjson.OPT_APPEND_NEWLINE))
+    sys.stdout.buffer.flush()
+
+
+def _read_stdin(loop, queue):
+    """Forward raw stdin lines (bytes) to `queue` from a daemon thread; `None` marks EOF.
+
+    A thread works for both pipes and consoles on every platform, unlike `connect_read_pipe`.
+    Lines stay undecoded: orjson parses UTF-8 bytes directly.
+    """
+    reader = sys.stdin.buffer
+    while True:
+        line = reader.readline()
+        if not line:
+            break
+        loop.call_soon_threadsafe(queue.put_nowait, line)
+    loop.call_soon_threadsafe(queue.put_nowait, None)
+
+
+async def handle(msg, tools, executor):
+    req_id = msg.get("id")
+    tool = msg.get("tool")
+    # "args": null (or omitted) means a call without arguments
+    args = msg.get("args") or {}
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received request id=%s tool=%s args=%s", req_id, tool, args)
+
+    # every request gets a response line, even a malformed one, so clients never wait forever
+    try:
+        if not isinstance(tool, str):
+            send_response(req_id, error=f"Invalid tool: {tool!r}. `tool` must be a string.")
+            return
+
+        if tool == "list_tools":
+            send_response(req_id, {k: {"description": v["description"], "args": v["args"]} for k, v in tools.items()})
+            return
 
+        if tool not in tools:
+            send_response(req_id, error=f"Unknown tool: {tool}. Call `list_tools` to see available tools.")
+            return
 
-def main():
+        if not isinstance(args, dict):
+            send_response(req_id, error=f"Invalid args for {tool}: expected a JSON object.")
+            return
+
+        func = tools[tool]["func"]
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(executor, partial(func, **args))
+        send_response(req_id, result=result)
+        logger.info("Tool %s executed for id=%s", tool, req_id)
+    except Exception as e:
+        logger.exception("Tool execution error: %s", e)
+        send_response(req_id, error=str(e))
+
+
+def _task_done(pending, task):
+    pending.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # handle() answers its own errors, so this only fires if responding itself failed
+        logger.error("Request task failed", exc_info=task.exception())
+
+
+async def main():
     logger.debug("Creating DarajaClient instance")
     client = DarajaClient()
     logger.debug("DarajaClient instance created")
@@ -39,42 +110,40 @@ def main():
     logger.info("MCP server started, waiting for STDIO messages")
     logger.debug("Entering STDIN loop to receive messages")
 
-    for line in sys.stdin:
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            msg = json.loads(line)
-        except Exception as e:
-            logger.exception("Failed to parse JSON from stdin: %s", e)
-            continue
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    threading.Thread(target=_read_stdin, args=(loop, queue), daemon=True).start()
 
-        req_id = msg.get("id")
-        tool = msg.get("tool")
-        args = msg.get("args", {})
+    pending = set()
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        while True:
+            line = await queue.get()
+            if line is None:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                msg = orjson.loads(line)
+            except Exception as e:
+                logger.exception("Failed to parse JSON from stdin: %s", e)
+                continue
+            if not isinstance(msg, dict):
+                logger.error("Ignoring stdin message that is not a JSON object: %r", line[:200])
+                continue
 
-        logger.debug("Received request id=%s tool=%s args=%s", req_id, tool, args)
+            task = asyncio.create_task(handle(msg, tools, executor))
+            pending.add(task)
+            task.add_done_callback(partial(_task_done, pending))
 
-        if tool == "list_tools":
-            send_response(req_id, {k: {"description": v["description"], "args": v["args"]} for k, v in tools.items()})
-            continue
-
-        if tool not in tools:
-            send_response(req_id, error=f"Unknown tool: {tool}. Call `list_tools` to see available tools.")
-            continue
-
-        func = tools[tool]["func"]
-        try:
-            result = func(**args) if args else func()
-            send_response(req_id, result=result)
-            logger.info("Tool %s executed for id=%s", tool, req_id)
-        except Exception as e:
-            logger.exception("Tool execution error: %s", e)
-            send_response(req_id, error=str(e))
+        # stdin closed: let in-flight tool calls finish and respond before exiting
+        if pending:
+            # one failing task must not cancel the others still waiting to respond
+            await asyncio.gather(*pending, return_exceptions=True)
 
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Server interrupted and shutting down")
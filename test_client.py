@@ -1,34 +1,82 @@
 import json
+import time
+import queue
+import atexit
+import itertools
+import threading
 import subprocess
 import argparse
 import sys
+import orjson
 
+# One long-lived server process; requests are multiplexed over its stdin/stdout pipes
+_proc = None
+_lines = None
+_ids = itertools.count(1)
+# Seconds to wait for a response before giving up on the server
+REQUEST_TIMEOUT = 15
 
-def run_request(tool: str, args: dict):
-    req = {"id": 1, "tool": tool, "args": args}
-    payload = json.dumps(req, ensure_ascii=False) + "\n"
 
-    proc = subprocess.Popen([sys.executable, "server.py"], cwd='.', stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+def _pump_stdout(proc, lines):
+    # readline() blocks, so it runs on a daemon thread and run_request waits on the queue with a deadline
+    for line in iter(proc.stdout.readline, b''):
+        lines.put(line)
+    lines.put(b'')
+
+
+def _get_server() -> subprocess.Popen:
+    global _proc, _lines
+    if _proc is None or _proc.poll() is not None:
+        # stderr is inherited so server logs stream straight to the terminal.
+        # Binary pipes: orjson reads and writes bytes, so lines are never decoded/re-encoded.
+        _proc = subprocess.Popen([sys.executable, "server.py"], cwd='.', stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        _lines = queue.Queue()
+        threading.Thread(target=_pump_stdout, args=(_proc, _lines), daemon=True).start()
+    return _proc
+
+
+def _stop_server():
+    if _proc is None or _proc.poll() is not None:
+        return
+    # closing stdin lets the server finish in-flight requests and exit cleanly
+    _proc.stdin.close()
     try:
-        out, err = proc.communicate(input=payload, timeout=15)
+        _proc.wait(timeout=15)
     except subprocess.TimeoutExpired:
-        proc.kill()
-        out, err = proc.communicate()
+        _proc.kill()
 
-    if err:
-        print("--- STDERR ---")
-        print(err, end='')
-    print("--- STDOUT ---")
-    print(out, end='')
 
-    # Try to find a JSON line in stdout
-    for line in out.splitlines():
-        line = line.strip()
+atexit.register(_stop_server)
+
+
+def run_request(tool: str, args: dict):
+    proc = _get_server()
+    req_id = next(_ids)
+    req = {"id": req_id, "tool": tool, "args": args}
+    payload = orjson.dumps(req, option=orjson.OPT_APPEND_NEWLINE)
+
+    proc.stdin.write(payload)
+    proc.stdin.flush()
+
+    print("--- STDOUT ---")
+    # Read lines until the response carrying our id arrives or the deadline passes
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    while True:
+        try:
+            line = _lines.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            print(f'\nNo response within {REQUEST_TIMEOUT}s; killing the server.')
+            proc.kill()
+            proc.wait()
+            return None
         if not line:
+            break
+        sys.stdout.write(line.decode('utf-8', 'replace'))
+        if line.isspace():
             continue
         try:
-            obj = json.loads(line)
-            if obj.get('id') == 1:
+            obj = orjson.loads(line)
+            if obj.get('id') == req_id:
                 print('\nParsed response:')
                 print(json.dumps(obj, indent=2, ensure_ascii=False))
                 return obj
@@ -43,6 +91,7 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--tool', default='generate_test_credentials')
     parser.add_argument('--arg', action='append', help='arg in key=value form', default=[])
+    parser.add_argument('--repeat', type=int, default=1, help='send the request N times through one server process')
     args = parser.parse_args()
 
     arg_dict = {}
@@ -56,7 +105,8 @@ def main():
                 v_parsed = v
             arg_dict[k] = v_parsed
 
-    run_request(args.tool, arg_dict)
+    for _ in range(args.repeat):
+        run_request(args.tool, arg_dict)
 
 
 if __name__ == '__main__':